@@ -1,22 +1,114 @@
+import asyncio
+import functools
+import hashlib
 import os
 import re
+import orjson
 import requests
-from typing import Tuple
+from contextvars import ContextVar
+from requests.adapters import HTTPAdapter
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional, Tuple
 
 from appwrite.client import Client
 from appwrite.services.storage import Storage
-from appwrite.services.functions import Functions
 from appwrite.input_file import InputFile
 from appwrite.services.tables_db import TablesDB
 from appwrite.id import ID
+from appwrite.query import Query
 
-from google import genai
-import edge_tts
+from aiolimiter import AsyncLimiter
 
-# Gemini client
-gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 DIFFBOT_TOKEN = os.getenv("DIFFBOT_TOKEN")
 
+# Appwrite settings, read once per container so missing variables fail at cold start
+APPWRITE_PROJECT_ID = os.environ["APPWRITE_FUNCTION_PROJECT_ID"]
+APPWRITE_FUNCTION_ID = os.environ["APPWRITE_FUNCTION_ID"]
+APPWRITE_BUCKET_ID = os.environ["APPWRITE_BUCKET_ID"]
+APPWRITE_DATABASE_ID = os.environ["APPWRITE_DATABASE_ID"]
+APPWRITE_TABLE_ID = os.environ["APPWRITE_TABLE_ID"]
+AUDIO_URL_PREFIX = f"https://fra.cloud.appwrite.io/v1/storage/buckets/{APPWRITE_BUCKET_ID}/files/"
+AUDIO_URL_SUFFIX = f"/view?project={APPWRITE_PROJECT_ID}"
+
+# API key of the execution being handled, set per request in main()
+request_api_key: ContextVar[str] = ContextVar("request_api_key")
+
+
+class RequestScopedClient(Client):
+    """Appwrite client that authenticates with the API key of the current request.
+
+    Executions can overlap in one container and each gets its own short-lived key,
+    so the key is read from a context variable instead of being set on the shared client.
+    """
+
+    def call(self, method, path='', headers=None, params=None, response_type='json'):
+        headers = {**(headers or {}), "x-appwrite-key": request_api_key.get()}
+        return super().call(method, path, headers, params, response_type)
+
+
+# Appwrite client and services, built once per container
+client = RequestScopedClient().set_project(APPWRITE_PROJECT_ID)
+storage = Storage(client)
+tablesDB = TablesDB(client)
+
+
+# Gemini, Edge TTS and the Functions service are only needed on some paths
+# (e.g. queueing a POST never calls Gemini), so they are imported on first use
+# to keep cold starts light.
+@functools.lru_cache(maxsize=None)
+def get_gemini_client():
+    """Return the shared Gemini client, importing the SDK on first use."""
+    from google import genai
+    return genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+
+
+@functools.lru_cache(maxsize=None)
+def get_functions():
+    """Return the shared Appwrite Functions service, importing it on first use."""
+    from appwrite.services.functions import Functions
+    return Functions(client)
+
+# Shared HTTP session so warm invocations reuse Diffbot connections
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# Gemini models tried in order until one succeeds
+GEMINI_MODELS = ["gemini-2.5-flash", "gemini-2.0-flash", "gemini-1.5-flash"]
+
+# Gemini quota per container, kept just under the project's limits to avoid 429 retries
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "900"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "900000"))
+gemini_request_limiter = AsyncLimiter(GEMINI_RPM, 60)
+gemini_token_limiter = AsyncLimiter(GEMINI_TPM, 60)
+
+# Seconds before a slow Gemini call is hedged with the next model, and calls allowed in flight
+GEMINI_HEDGE_DELAY = 3
+GEMINI_MAX_INFLIGHT = 2
+
+# Rewrites and summaries don't need extended thinking, only 2.5 models support the setting
+GEMINI_CONFIGS = {"gemini-2.5-flash": {"thinking_config": {"thinking_budget": 0}}}
+
+# How long a generated row is reused for repeat requests of the same article
+CACHE_TTL_HOURS = int(os.getenv("CACHE_TTL_HOURS", "24"))
+
+# Appwrite function timeout, a row still pending or processing after this was abandoned
+FUNCTION_TIMEOUT_SECONDS = int(os.getenv("FUNCTION_TIMEOUT_SECONDS", "900"))
+
+# Sentence splitting for streamed TTS: end punctuation (plus closing quotes) then whitespace
+SENTENCE_BOUNDARY_PATTERN = re.compile(r'[.!?]+["\')\]]*\s+')
+SENTENCE_ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "prof.", "st.", "vs.", "etc.", "e.g.", "i.e."}
+MIN_SENTENCE_LENGTH = 10
+
+# Longest first line of a rewrite that is still accepted as its title
+MAX_TITLE_LENGTH = 120
+
+# Articles shorter than this are used as-is instead of being rewritten and summarized by Gemini
+SHORT_ARTICLE_LENGTH = int(os.getenv("SHORT_ARTICLE_LENGTH", "400"))
+
+# Characters batched per Edge TTS call after the first sentence, and calls allowed in flight
+TTS_SEGMENT_LENGTH = 500
+tts_semaphore = asyncio.Semaphore(4)
+
 # Allowed origins for CORS
 ALLOWED_ORIGINS = [
     "http://localhost:8080",
@@ -28,13 +120,50 @@ def get_origin_header(origin: str) -> str:
     return origin if origin in ALLOWED_ORIGINS else ""
 
 
+def get_cache_key(url: str, text: str) -> str:
+    """Hash the request source so repeat submissions share a cache entry."""
+    source = f"text:{text}" if text else f"url:{url}"
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def find_cached_row(cache_key: str) -> Optional[dict]:
+    """Return a usable row generated from the same source, if any.
+
+    Finished rows are reused for CACHE_TTL_HOURS. Rows still being generated are only reused
+    while their background execution can still be running, so a killed one isn't served forever.
+    """
+    now = datetime.now(timezone.utc)
+    ttl_cutoff = now - timedelta(hours=CACHE_TTL_HOURS)
+    running_cutoff = now - timedelta(seconds=FUNCTION_TIMEOUT_SECONDS)
+    try:
+        result = tablesDB.list_rows(
+            database_id=APPWRITE_DATABASE_ID,
+            table_id=APPWRITE_TABLE_ID,
+            queries=[
+                Query.equal("cacheKey", cache_key),
+                Query.not_equal("status", "failed"),
+                Query.greater_than("$createdAt", ttl_cutoff.isoformat()),
+                Query.or_queries([
+                    Query.equal("status", "done"),
+                    Query.greater_than("$createdAt", running_cutoff.isoformat()),
+                ]),
+                Query.order_desc("$createdAt"),
+                Query.limit(1),
+            ],
+        )
+        rows = result["rows"]
+        return rows[0] if rows else None
+    except Exception:
+        return None
+
+
 def fetch_article_text(url: str) -> Tuple[str, str]:
     """Fetch clean article text and title using Diffbot API."""
     api_url = f"https://api.diffbot.com/v3/article?token={DIFFBOT_TOKEN}&url={url}"
     try:
-        response = requests.get(api_url, timeout=25)
+        response = http_session.get(api_url, timeout=25)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
         obj = data.get("objects", [{}])[0]
         if response.status_code == 404:
             return "", ""
@@ -43,75 +172,336 @@ def fetch_article_text(url: str) -> Tuple[str, str]:
         return "", ""
 
 
-def generate_with_fallback(prompt: str) -> str:
-    """Try Gemini 2.5 → 2.0 → 1.5 Flash with graceful fallback, raise if all fail."""
-    models = ["gemini-2.5-flash", "gemini-2.0-flash", "gemini-1.5-flash"]
-    
+async def acquire_gemini_capacity(prompt: str) -> None:
+    """Wait until a Gemini call fits in the request and estimated token budgets."""
+    await gemini_request_limiter.acquire()
+    await gemini_token_limiter.acquire(min(len(prompt) // 4, GEMINI_TPM))
+
+
+async def generate_with_fallback(prompt: str) -> str:
+    """Race Gemini 2.5 → 2.0 → 1.5 Flash, starting the next model when one fails or is slow, raise if all fail."""
+
+    async def generate(model: str, started: asyncio.Event) -> str:
+        try:
+            await acquire_gemini_capacity(prompt)
+        finally:
+            started.set()
+        result = await get_gemini_client().aio.models.generate_content(
+            model=model, contents=prompt, config=GEMINI_CONFIGS.get(model)
+        )
+        text = (getattr(result, "text", "") or "").strip()
+        if not text:
+            raise RuntimeError(f"{model} returned no text")
+        return text
+
+    models = iter(GEMINI_MODELS)
+    pending = set()
+    started = asyncio.Event()
+    hedge_due = True
     last_error = None
-    for model in models:
+    try:
+        while True:
+            # Hedge: start the next model once the in-flight ones fail or run past the delay
+            if hedge_due and len(pending) < GEMINI_MAX_INFLIGHT:
+                model = next(models, None)
+                if model:
+                    started = asyncio.Event()
+                    pending.add(asyncio.create_task(generate(model, started)))
+                hedge_due = False
+            if not pending:
+                break
+
+            if started.is_set():
+                done, pending = await asyncio.wait(
+                    pending, timeout=GEMINI_HEDGE_DELAY, return_when=asyncio.FIRST_COMPLETED
+                )
+                hedge_due = hedge_due or not done
+            else:
+                # Time spent queued on the rate limiter doesn't count towards the hedge delay
+                capacity = asyncio.create_task(started.wait())
+                done, _ = await asyncio.wait(pending | {capacity}, return_when=asyncio.FIRST_COMPLETED)
+                capacity.cancel()
+                done.discard(capacity)
+                pending -= done
+
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+                hedge_due = True
+    finally:
+        for task in pending:
+            task.cancel()
+
+    raise RuntimeError("All Gemini models failed") from last_error
+
+
+async def stream_with_fallback(prompt: str) -> AsyncIterator[str]:
+    """Stream Gemini output, falling back to the next model until one starts producing text."""
+    last_error = None
+    for model in GEMINI_MODELS:
+        started = False
         try:
-            result = gemini_client.models.generate_content(
-                model=model, contents=prompt
+            await acquire_gemini_capacity(prompt)
+            stream = await get_gemini_client().aio.models.generate_content_stream(
+                model=model, contents=prompt, config=GEMINI_CONFIGS.get(model)
             )
-            text = getattr(result, "text", "").strip()
-            if text:
-                return text
+            async for chunk in stream:
+                piece = getattr(chunk, "text", None) or ""
+                if piece:
+                    started = True
+                    yield piece
+            if started:
+                return
         except Exception as e:
+            # Text already handed to the caller can't be retracted, so only fall back before that
+            if started:
+                raise
             last_error = e
             continue
-    
+
     raise RuntimeError("All Gemini models failed") from last_error
 
 
-def generate_simplified_text(text: str) -> str:
-    """Use Gemini to rewrite article in dyslexia-friendly format."""
+def split_sentences(buffer: str) -> Tuple[List[str], str]:
+    """Split completed sentences off a streamed buffer, returning them and the unfinished tail."""
+    sentences = []
+    start = 0
+    for match in SENTENCE_BOUNDARY_PATTERN.finditer(buffer):
+        candidate = buffer[start:match.end()].strip()
+        last_word = candidate.rsplit(None, 1)[-1].lower()
+        if len(candidate) < MIN_SENTENCE_LENGTH or last_word in SENTENCE_ABBREVIATIONS:
+            continue
+        sentences.append(candidate)
+        start = match.end()
+    return sentences, buffer[start:]
+
+
+def get_first_sentence(text: str) -> str:
+    """Return the first sentence of text, or all of it if no sentence boundary is found."""
+    sentences, _ = split_sentences(text.strip() + " ")
+    return sentences[0] if sentences else text.strip()
+
+
+def parse_title_line(line: str) -> str:
+    """Return line cleaned up as a title if it looks like one, else an empty string."""
+    title = clean_text_for_tts(line).strip()
+    # Titles are short and don't end like a sentence, anything else is rewrite text
+    if not title or len(title) > MAX_TITLE_LENGTH or title[-1] in ".!?":
+        return ""
+    return title
+
+
+async def generate_simplified_text(text: str, include_title: bool = False) -> Tuple[str, str, bytes]:
+    """Stream a dyslexia-friendly rewrite from Gemini and narrate it as sentences arrive.
+
+    With include_title, Gemini also writes a title on the first line so no separate call is needed.
+    Returns the title (empty unless requested), the rewritten text and the MP3 audio.
+    Short articles gain nothing from a rewrite, so they are narrated as-is.
+    """
+    if len(text) < SHORT_ARTICLE_LENGTH:
+        title = ""
+        if include_title:
+            # Pasted snippets often start with their own title line, use it only if it looks like one
+            title = parse_title_line(text.strip().split("\n", 1)[0]) or "Untitled"
+        return title, text.strip(), await generate_tts(text)
+
+    title_instruction = (
+        "On the first line write only a concise and descriptive title for the article, then a blank line, then the rewrite. "
+        if include_title else ""
+    )
     prompt = (
         "Rewrite this article to be dyslexia-friendly with large spacing and easy-to-read formatting. "
+        f"{title_instruction}"
         "Do not add any headings, labels, or commentary. Only output the rewritten article:\n\n"
         f"{text}"
     )
-    return generate_with_fallback(prompt)
-
+    title = ""
+    heading = ""
+    awaiting_title = include_title
+    pieces: List[str] = []
+    tts_tasks: List[asyncio.Task] = []
+    buffer = ""
+    segment = ""
+
+    def dispatch(chunk: str) -> None:
+        # Edge TTS returns no audio for segments with nothing to speak (e.g. "---"), skip them
+        if not any(char.isalnum() for char in clean_text_for_tts(chunk)):
+            return
+        tts_tasks.append(asyncio.create_task(generate_tts_segment(chunk)))
+
+    def feed(piece: str) -> None:
+        nonlocal buffer, segment
+        pieces.append(piece)
+        sentences, buffer = split_sentences(buffer + piece)
+        for sentence in sentences:
+            segment = f"{segment} {sentence}".strip()
+            # Narrate the first sentence alone so audio starts early, then batch
+            if not tts_tasks or len(segment) >= TTS_SEGMENT_LENGTH:
+                dispatch(segment)
+                segment = ""
 
-def generate_tldr(text: str) -> str:
+    try:
+        async for piece in stream_with_fallback(prompt):
+            if awaiting_title:
+                # Hold output back until the first line is complete
+                heading += piece
+                if "\n" not in heading.lstrip():
+                    continue
+                line, _, rest = heading.lstrip().partition("\n")
+                title = parse_title_line(line)
+                # If the model skipped the title, the first line is part of the rewrite
+                piece = rest if title else heading
+                awaiting_title = False
+            feed(piece)
+
+        if awaiting_title:
+            # No title line came back, so the whole output is the rewrite
+            feed(heading)
+
+        segment = f"{segment} {buffer}".strip()
+        if segment:
+            dispatch(segment)
+
+        # Edge TTS returns standalone MP3 frames, so segments concatenate cleanly
+        audio_segments = await asyncio.gather(*tts_tasks)
+    except BaseException:
+        for task in tts_tasks:
+            task.cancel()
+        raise
+
+    # A missing segment would leave a gap in the narration, so treat it as a failure
+    audio = b"".join(audio_segments) if all(audio_segments) else b""
+    if include_title and not title:
+        title = "Untitled"
+    return title, "".join(pieces).strip(), audio
+
+
+async def generate_tldr(text: str) -> str:
     """Use Gemini to summarize article into bullet points."""
+    if len(text) < SHORT_ARTICLE_LENGTH:
+        return f"- {get_first_sentence(text)}"
+
     prompt = (
         "Summarize this article in concise bullet points only. "
         "Do not add any introduction or labels, just the bullets:\n\n"
         f"{text}"
     )
-    return generate_with_fallback(prompt)
+    return await generate_with_fallback(prompt)
 
-def generate_title(text: str) -> str:
-    """Use Gemini to generate a title for the article."""
-    prompt = (
-        "Generate a concise and descriptive title for the following article only. "
-        "Do not add any additional commentary or explanation. Just the title:\n\n"
-        f"{text}"
-    )
-    result = gemini_client.models.generate_content(
-        model="gemini-2.5-flash", contents=prompt
-    )
-    return str(getattr(result, "text", ""))
+
+# Markdown artifacts stripped before TTS: bold/italic and code/blockquote markers
+# are single characters dropped with str.translate, only headings need a regex
+TTS_CLEANUP_TABLE = str.maketrans('', '', '*_`>~')
+TTS_HEADING_PATTERN = re.compile(r'^#+\s*', flags=re.MULTILINE)
 
 
 def clean_text_for_tts(text: str) -> str:
     """Remove markdown and formatting artifacts before TTS."""
-    text = re.sub(r'(\*\*|\*|__|_)', '', text)  # bold/italic
-    text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)  # headings
-    text = re.sub(r'[`>~]', '', text)  # code/blockquote
-    return text
+    return TTS_HEADING_PATTERN.sub('', text.translate(TTS_CLEANUP_TABLE))
 
 
-async def generate_tts(text: str, filename: str = "/tmp/audio.mp3") -> str:
-    """Generate TTS audio file using Edge TTS."""
+async def generate_tts(text: str) -> bytes:
+    """Stream TTS audio from Edge TTS into memory."""
+    import edge_tts
+
     try:
         cleaned_text = clean_text_for_tts(text)
         tts = edge_tts.Communicate(cleaned_text, voice="en-GB-LibbyNeural")
-        await tts.save(filename)
-        return filename
+        audio = bytearray()
+        async for chunk in tts.stream():
+            if chunk["type"] == "audio":
+                audio.extend(chunk["data"])
+        return bytes(audio)
     except Exception:
-        return ""
+        return b""
+
+
+async def generate_tts_segment(text: str) -> bytes:
+    """Generate TTS audio for one segment, bounding concurrent Edge TTS connections."""
+    async with tts_semaphore:
+        return await generate_tts(text)
+
+
+async def upload_audio(audio: bytes) -> str:
+    """Upload MP3 audio to the bucket and return the file id.
+
+    The SDK splits large files into chunks and sends them one at a time, which Appwrite
+    requires since it tracks chunk progress on the file document.
+    """
+    file = await asyncio.to_thread(
+        storage.create_file,
+        bucket_id=APPWRITE_BUCKET_ID,
+        file_id=ID.unique(),
+        file=InputFile.from_bytes(audio, filename="audio.mp3"),
+    )
+    return str(file["$id"])
+
+
+def claim_pending_row(row_id: str, cache_key: str) -> bool:
+    """Move a pending row for this source to processing, return False if there was none.
+
+    The status and cacheKey checks run in the same update, so a row is only claimed once
+    and only by a request for the article it was created for.
+    """
+    result = tablesDB.update_rows(
+        database_id=APPWRITE_DATABASE_ID,
+        table_id=APPWRITE_TABLE_ID,
+        data={"status": "processing"},
+        queries=[
+            Query.equal("$id", row_id),
+            Query.equal("status", "pending"),
+            Query.equal("cacheKey", cache_key),
+        ],
+    )
+    return result["total"] > 0
+
+
+async def process_article(row_id: str, url: Optional[str], text: Optional[str]) -> None:
+    """Generate the simplified text, TL;DR and audio for a claimed row and mark it done."""
+    if text:
+        article_text = text
+        title = ""
+    else:
+        article_text, title = await asyncio.to_thread(fetch_article_text, url)
+        if not article_text:
+            raise RuntimeError(f"Could not extract article text from {url}")
+
+    # Generate outputs concurrently, the Gemini calls are independent.
+    # Diffbot already provides a title for URLs, otherwise it comes from the rewrite.
+    simplify_task = asyncio.create_task(generate_simplified_text(article_text, include_title=not title))
+    tldr_task = asyncio.create_task(generate_tldr(article_text))
+    try:
+        (generated_title, simplified, audio), tldr = await asyncio.gather(simplify_task, tldr_task)
+    except BaseException:
+        # Tear down the sibling too, so a failed row doesn't keep Gemini and TTS calls running
+        simplify_task.cancel()
+        tldr_task.cancel()
+        raise
+    title = title or generated_title
+
+    if not audio:
+        raise RuntimeError("TTS generation produced no audio")
+
+    # Upload audio file
+    file_id = await upload_audio(audio)
+
+    audio_link = AUDIO_URL_PREFIX + file_id + AUDIO_URL_SUFFIX
+
+    # Fill in the pending row
+    await asyncio.to_thread(
+        tablesDB.update_row,
+        database_id=APPWRITE_DATABASE_ID,
+        table_id=APPWRITE_TABLE_ID,
+        row_id=row_id,
+        data={
+            "title": title,
+            "simplifiedText": simplified,
+            "tldr": tldr,
+            "audioUrl": audio_link,
+            "status": "done",
+        },
+    )
 
 
 async def main(context):
@@ -132,21 +522,15 @@ async def main(context):
                 },
             )
 
-        # Init Appwrite client
-        client = (
-            Client()
-            .set_project(os.environ["APPWRITE_FUNCTION_PROJECT_ID"])
-            .set_key(context.req.headers["x-appwrite-key"])
-        )
-        storage = Storage(client)
-        tablesDB = TablesDB(client)
+        # Authenticate the shared Appwrite client with this execution's key
+        request_api_key.set(context.req.headers["x-appwrite-key"])
 
         # ---- GET: check execution status ----
         if context.req.method == "GET":
             workerid = context.req.query.get("workerid")
-            functions = Functions(client)
-            response = functions.get_execution(
-                function_id=os.environ["APPWRITE_FUNCTION_ID"],
+            response = await asyncio.to_thread(
+                get_functions().get_execution,
+                function_id=APPWRITE_FUNCTION_ID,
                 execution_id=workerid
             )
             return context.res.json(
@@ -154,65 +538,106 @@ async def main(context):
                 headers={"Access-Control-Allow-Origin": allowed_origin}
             )
 
-        # ---- POST: process article or text ----
-        data = context.req.body_json
+        # Parse the raw body with orjson rather than the runtime's stdlib-based body_json
+        data = orjson.loads(context.req.body_binary)
+
+        # ---- Background execution: do the heavy work for a pending row ----
+        if data.get("rowId"):
+            row_id = data["rowId"]
+            cache_key = get_cache_key(data.get("url"), data.get("text"))
+            if not await asyncio.to_thread(claim_pending_row, row_id, cache_key):
+                return context.res.send("", 409)
+            try:
+                await process_article(row_id, data.get("url"), data.get("text"))
+            except Exception:
+                await asyncio.to_thread(
+                    tablesDB.update_row,
+                    database_id=APPWRITE_DATABASE_ID,
+                    table_id=APPWRITE_TABLE_ID,
+                    row_id=row_id,
+                    data={"status": "failed"},
+                )
+                raise
+            return context.res.json({"id": row_id})
+
+        # ---- POST: queue article or text ----
         url, text = data.get("url"), data.get("text")
 
-        if text:
-            article_text = text
-            title = generate_title(text)
-        elif url:
-            article_text, title = fetch_article_text(url)
-            if not article_text:
-                return context.res.send(
-                    "",
-                    404,
-                    headers={"Access-Control-Allow-Origin": allowed_origin}
-                )
-        else:
+        if not (text or url):
             return context.res.send(
                 "",
                 400,
                 headers={"Access-Control-Allow-Origin": allowed_origin}
             )
 
+        # Serve repeat articles from the row generated the first time
+        cache_key = get_cache_key(url, text)
         docid = data.get("docid")
+        cached = await asyncio.to_thread(find_cached_row, cache_key)
+        # A row still being generated can't be copied under the client's docid, so only reuse it without one
+        if cached and (not docid or cached["status"] == "done"):
+            cached_id = str(cached["$id"])
+            if docid and docid != cached_id:
+                # Clients look results up by their own docid, so save a copy of the cached row under it
+                await asyncio.to_thread(
+                    tablesDB.create_row,
+                    database_id=APPWRITE_DATABASE_ID,
+                    table_id=APPWRITE_TABLE_ID,
+                    row_id=docid,
+                    data={
+                        field: cached.get(field)
+                        for field in (
+                            "title", "simplifiedText", "tldr", "audioUrl",
+                            "url", "status", "cacheKey", "workerId",
+                        )
+                    },
+                )
+                cached_id = docid
+            return context.res.json(
+                {"id": cached_id, "workerid": str(cached.get("workerId") or "")},
+                headers={"Access-Control-Allow-Origin": allowed_origin}
+            )
 
-        # Generate outputs (always cast to str for safety)
-        simplified = generate_simplified_text(article_text)
-        tldr = generate_tldr(article_text)
-        await generate_tts(simplified, filename="/tmp/audio.mp3")
-
-        # Upload audio file
-        file = storage.create_file(
-            bucket_id=os.environ["APPWRITE_BUCKET_ID"],
-            file_id=ID.unique(),
-            file=InputFile.from_path("/tmp/audio.mp3"),
-        )
-
-        audio_link = (
-            f"https://fra.cloud.appwrite.io/v1/storage/buckets/"
-            f"{os.environ['APPWRITE_BUCKET_ID']}/files/{file['$id']}/view"
-            f"?project={os.environ['APPWRITE_FUNCTION_PROJECT_ID']}"
+        # Save a pending row right away, the background execution fills it in
+        row = await asyncio.to_thread(
+            tablesDB.create_row,
+            database_id=APPWRITE_DATABASE_ID,
+            table_id=APPWRITE_TABLE_ID,
+            row_id=docid or ID.unique(),
+            data={"status": "pending", "url": url, "cacheKey": cache_key},
         )
+        row_id = str(row["$id"])
 
-        # Save row to DB
-        result_data = {
-            "title": title,
-            "simplifiedText": simplified,
-            "tldr": tldr,
-            "audioUrl": audio_link,
-        }
-
-        row = tablesDB.create_row(
-            database_id=os.environ["APPWRITE_DATABASE_ID"],
-            table_id=os.environ["APPWRITE_TABLE_ID"],
-            row_id=docid,
-            data=result_data,
+        try:
+            execution = await asyncio.to_thread(
+                get_functions().create_execution,
+                function_id=APPWRITE_FUNCTION_ID,
+                body=orjson.dumps({"rowId": row_id, "url": url, "text": text}).decode(),
+                xasync=True,
+            )
+        except Exception:
+            # Nothing will pick the row up, so don't leave it pending for the cache to serve
+            await asyncio.to_thread(
+                tablesDB.update_row,
+                database_id=APPWRITE_DATABASE_ID,
+                table_id=APPWRITE_TABLE_ID,
+                row_id=row_id,
+                data={"status": "failed"},
+            )
+            raise
+        workerid = str(execution["$id"])
+
+        # Keep the worker id on the row so cache hits can be polled the same way
+        await asyncio.to_thread(
+            tablesDB.update_row,
+            database_id=APPWRITE_DATABASE_ID,
+            table_id=APPWRITE_TABLE_ID,
+            row_id=row_id,
+            data={"workerId": workerid},
         )
 
         return context.res.json(
-            {"id": str(row["$id"])},
+            {"id": row_id, "workerid": workerid},
             headers={"Access-Control-Allow-Origin": allowed_origin}
         )
 